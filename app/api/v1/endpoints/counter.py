@@ -1,20 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Path
+from fastapi import APIRouter, HTTPException, Depends, Path, Request
 from typing import Dict, Any
 from ....services.visit_counter import VisitCounterService
-from ....schemas.counter import VisitCount
 
 router = APIRouter()
 
-_counter_service = None
-
-def get_visit_counter_service():
+def get_visit_counter_service(request: Request) -> VisitCounterService:
     """
-    Dependency that returns a singleton instance of VisitCounterService
+    Dependency that returns the application's VisitCounterService instance
     """
-    global _counter_service
-    if _counter_service is None:
-        _counter_service = VisitCounterService()
-    return _counter_service
+    return request.app.state.visit_counter
 
 @router.post("/visit/{page_id}")
 async def record_visit(
@@ -41,7 +35,7 @@ async def record_visit(
             detail=f"Failed to record visit: {str(e)}"
         )
 
-@router.get("/visits/{page_id}", response_model=VisitCount)
+@router.get("/visits/{page_id}")
 async def get_visits(
     page_id: str = Path(..., description="Unique identifier for the page"),
     counter_service: VisitCounterService = Depends(get_visit_counter_service)
@@ -52,19 +46,11 @@ async def get_visits(
     - Returns the total visit count for the specified page
     - Serves from in-memory cache if available
     - Falls back to Redis if cache miss
-    - Indicates the source of the count (in_memory/redis)
+    - Indicates the source of the count (in_memory/redis_<node>/write_buffer)
     """
     try:
-        count, source = await counter_service.get_visit_count(page_id)
-        
-        if source == "cache":
-            served_via = "in_memory"
-        elif isinstance(source, str) and source.startswith("redis"):
-            served_via = source  
-        else:
-            served_via = "redis"
-            
-        return VisitCount(visits=count, served_via=served_via)
+        count, served_via = await counter_service.get_visit_count(page_id)
+        return {"visits": count, "served_via": served_via}
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -83,7 +69,7 @@ async def get_counter_status(
         return {
             "status": "healthy",
             "cache_size": len(counter_service.cache),
-            "write_buffer_size": len(counter_service.write_buffer),
+            "write_buffer_size": counter_service.get_write_buffer_size(),
             "cache_hits": cache_stats["hits"],
             "cache_misses": cache_stats["misses"]
         }
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import model_validator, Field
-from typing import List
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -12,6 +12,10 @@ class Settings(BaseSettings):
     REDIS_DB: int = Field(default=0, description="Redis database number")
     REDIS_TIMEOUT: int = Field(default=5, description="Redis connection timeout in seconds")
     REDIS_RETRY_ATTEMPTS: int = Field(default=3, description="Number of Redis retry attempts")
+    REDIS_MAX_CONNECTIONS: int = Field(
+        default=200,
+        description="Maximum number of pooled connections per Redis node"
+    )
     
     VIRTUAL_NODES: int = Field(
         default=100,
@@ -20,7 +24,19 @@ class Settings(BaseSettings):
     
     CACHE_TTL_SECONDS: int = Field(
         default=5,
-        description="Time-to-live for cached items in seconds"
+        description="Cache TTL in seconds, also the interval between cache expiry sweeps"
+    )
+    HOT_CACHE_TTL_SECONDS: Optional[float] = Field(
+        default=None,
+        description="Time-to-live for cached counts of frequently read pages in seconds; defaults to CACHE_TTL_SECONDS"
+    )
+    COLD_CACHE_TTL_SECONDS: float = Field(
+        default=1,
+        description="Time-to-live for cached counts of rarely read pages in seconds"
+    )
+    CACHE_ADMISSION_THRESHOLD: int = Field(
+        default=2,
+        description="Minimum estimated read frequency for a page to be cached as hot"
     )
     CACHE_CAPACITY: int = Field(
         default=1000,
@@ -46,6 +62,19 @@ class Settings(BaseSettings):
         description="Interval for metrics collection in seconds"
     )
 
+    @model_validator(mode='before')
+    @classmethod
+    def default_hot_cache_ttl(cls, data):
+        """Use CACHE_TTL_SECONDS for hot pages unless set explicitly"""
+        if isinstance(data, dict) and data.get("HOT_CACHE_TTL_SECONDS") is None:
+            data = {
+                **data,
+                "HOT_CACHE_TTL_SECONDS": data.get(
+                    "CACHE_TTL_SECONDS", cls.model_fields["CACHE_TTL_SECONDS"].default
+                )
+            }
+        return data
+
     @model_validator(mode='after')
     def validate_redis_nodes(self):
         """Validate Redis nodes configuration"""
@@ -72,8 +101,11 @@ class Settings(BaseSettings):
             "password": self.REDIS_PASSWORD,
             "db": self.REDIS_DB,
             "socket_timeout": self.REDIS_TIMEOUT,
-            "retry_on_timeout": True,
-            "max_connections": 10
+            # Writes are not idempotent; reads are retried by RedisManager instead
+            "retry_on_timeout": False,
+            "max_connections": self.REDIS_MAX_CONNECTIONS,
+            "socket_keepalive": True,
+            "health_check_interval": 30
         }
 
     class Config:
@@ -1,8 +1,13 @@
-import hashlib
-from typing import List, Dict, Any, Optional, Set
-from bisect import bisect
+import functools
+from collections import Counter
+import numpy as np
+import xxhash
+from typing import List, Dict, Any, Optional, Set, Union
 from ..core.config import settings
 
+MAX_RING_SIZE = 10_000
+SMALL_RING_SIZE = 50
+
 class ConsistentHash:
     def __init__(self, nodes: List[str], virtual_nodes: int = settings.VIRTUAL_NODES):
         """
@@ -10,19 +15,25 @@ class ConsistentHash:
 
         Args:
             nodes: List of node identifiers
-            virtual_nodes: Number of virtual nodes per physical node
+            virtual_nodes: Number of virtual nodes per physical node; lowered
+                as needed to keep the ring within MAX_RING_SIZE entries
         """
+        if nodes:
+            virtual_nodes = min(virtual_nodes, max(1, MAX_RING_SIZE // len(nodes)))
         self.virtual_nodes = virtual_nodes
         self.hash_ring: Dict[int, str] = {}
         self.sorted_keys: List[int] = []
         self.nodes: Set[str] = set()
+        self._ring_hashes = np.empty(0, dtype=np.uint64)
+        self._ring_nodes = np.empty(0, dtype=object)
+        self._get_node_cached = functools.lru_cache(maxsize=65536)(self._get_node_impl)
 
         for node in nodes:
             self.add_node(node)
 
-    def _get_hash(self, key: str) -> int:
+    def _get_hash(self, key: Union[str, bytes]) -> int:
         """
-        Calculate hash for a key using MD5
+        Calculate hash for a key using 64-bit xxHash
 
         Args:
             key: The key to hash
@@ -30,7 +41,30 @@ class ConsistentHash:
         Returns:
             Integer hash value
         """
-        return int(hashlib.md5(key.encode()).hexdigest(), 16)
+        if isinstance(key, str):
+            key = key.encode()
+        return xxhash.xxh64_intdigest(key)
+
+    def _get_hash_bytes(self, key: bytes) -> int:
+        """
+        Calculate hash for an already encoded key
+
+        Args:
+            key: The key to hash, as bytes
+
+        Returns:
+            Integer hash value
+        """
+        return xxhash.xxh64_intdigest(key)
+
+    def _rebuild_ring(self) -> None:
+        """Rebuild the sorted key list and the contiguous lookup arrays"""
+        self.sorted_keys = sorted(self.hash_ring.keys())
+        self._ring_hashes = np.array(self.sorted_keys, dtype=np.uint64)
+        self._ring_nodes = np.array(
+            [self.hash_ring[h] for h in self.sorted_keys], dtype=object
+        )
+        self._get_node_cached.cache_clear()
 
     def add_node(self, node: str) -> None:
         """
@@ -44,17 +78,22 @@ class ConsistentHash:
 
         self.nodes.add(node)
         
+        if len(self.nodes) * self.virtual_nodes > MAX_RING_SIZE:
+            # Shrink every node's share so the ring stays within MAX_RING_SIZE
+            self.virtual_nodes = max(1, MAX_RING_SIZE // len(self.nodes))
+            self.hash_ring.clear()
+            for ring_node in self.nodes:
+                self._place_virtual_nodes(ring_node)
+        else:
+            self._place_virtual_nodes(node)
+
+        self._rebuild_ring()
+
+    def _place_virtual_nodes(self, node: str) -> None:
+        """Put a node's virtual nodes on the hash ring"""
+        prefix = node.encode() + b"_"
         for i in range(self.virtual_nodes):
-            virtual_node_key = f"{node}_{i}"
-            hash_key = self._get_hash(virtual_node_key)
-            
-            while hash_key in self.hash_ring:
-                virtual_node_key = f"{virtual_node_key}_collision"
-                hash_key = self._get_hash(virtual_node_key)
-                
-            self.hash_ring[hash_key] = node
-
-        self.sorted_keys = sorted(self.hash_ring.keys())
+            self.hash_ring[self._get_hash_bytes(prefix + b"%d" % i)] = node
 
     def remove_node(self, node: str) -> None:
         """
@@ -72,15 +111,14 @@ class ConsistentHash:
         self.nodes.remove(node)
         keys_to_remove = []
 
+        prefix = node.encode() + b"_"
         for i in range(self.virtual_nodes):
-            virtual_node_key = f"{node}_{i}"
-            hash_key = self._get_hash(virtual_node_key)
-            keys_to_remove.append(hash_key)
+            keys_to_remove.append(self._get_hash_bytes(prefix + b"%d" % i))
 
         for key in keys_to_remove:
             self.hash_ring.pop(key, None)
 
-        self.sorted_keys = sorted(self.hash_ring.keys())
+        self._rebuild_ring()
 
     def get_node(self, key: str) -> str:
         """
@@ -98,13 +136,31 @@ class ConsistentHash:
         if not self.hash_ring:
             raise Exception("Hash ring is empty")
 
+        return self._get_node_cached(key)
+
+    def _get_node_impl(self, key: str) -> str:
+        """
+        Look up the node for a key on the ring, bypassing the cache
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The node responsible for the key
+        """
         key_hash = self._get_hash(key)
 
-        idx = bisect(self.sorted_keys, key_hash)
-        if idx == len(self.sorted_keys):
+        if len(self.sorted_keys) < SMALL_RING_SIZE:
+            for idx, ring_hash in enumerate(self.sorted_keys):
+                if ring_hash > key_hash:
+                    return self._ring_nodes[idx]
+            return self._ring_nodes[0]
+
+        idx = int(np.searchsorted(self._ring_hashes, np.uint64(key_hash), side="right"))
+        if idx == len(self._ring_hashes):
             idx = 0
 
-        return self.hash_ring[self.sorted_keys[idx]]
+        return self._ring_nodes[idx]
 
     def get_all_nodes(self) -> Set[str]:
         """
@@ -122,10 +178,8 @@ class ConsistentHash:
         Returns:
             Dictionary mapping nodes to their key count
         """
-        distribution = {}
-        for node in self.nodes:
-            distribution[node] = sum(1 for n in self.hash_ring.values() if n == node)
-        return distribution
+        counts = Counter(self.hash_ring.values())
+        return {node: counts.get(node, 0) for node in self.nodes}
 
     def is_empty(self) -> bool:
         """
@@ -139,5 +193,5 @@ class ConsistentHash:
     def clear(self) -> None:
         """Clear the hash ring"""
         self.hash_ring.clear()
-        self.sorted_keys.clear()
-        self.nodes.clear()
\ No newline at end of file
+        self.nodes.clear()
+        self._rebuild_ring()
\ No newline at end of file
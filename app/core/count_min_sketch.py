@@ -0,0 +1,62 @@
+import xxhash
+from typing import List, Optional
+
+class CountMinSketch:
+    def __init__(self, width: int = 1024, depth: int = 4, sample_size: Optional[int] = None):
+        """
+        Initialize an approximate frequency counter
+
+        Args:
+            width: Number of counters per row
+            depth: Number of rows (independent hash functions)
+            sample_size: Number of additions after which all counters are
+                halved so old traffic fades out; defaults to 10 * width
+        """
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size if sample_size is not None else 10 * width
+        self._table: List[List[int]] = [[0] * width for _ in range(depth)]
+        self._additions = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        data = key.encode()
+        return [xxhash.xxh64_intdigest(data, seed=row) % self.width for row in range(self.depth)]
+
+    def add(self, key: str) -> None:
+        """
+        Record one occurrence of a key
+
+        Args:
+            key: The key to count
+        """
+        for row, idx in zip(self._table, self._indexes(key)):
+            row[idx] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        """
+        Estimate how many times a key has been seen
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            Upper-bound estimate of the key's frequency
+        """
+        return min(row[idx] for row, idx in zip(self._table, self._indexes(key)))
+
+    def _age(self) -> None:
+        """Halve all counters"""
+        for row in self._table:
+            for idx, count in enumerate(row):
+                row[idx] = count >> 1
+        self._additions //= 2
+
+    def clear(self) -> None:
+        """Reset all counters to zero"""
+        for row in self._table:
+            row[:] = [0] * self.width
+        self._additions = 0
@@ -0,0 +1,185 @@
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+
+class LRUKCache:
+    def __init__(
+        self,
+        capacity: int,
+        k: int = 2,
+        ttl: float = 5,
+        retained_period: Optional[float] = None
+    ):
+        """
+        Initialize a bounded LRU-K cache with per-entry TTL
+
+        Args:
+            capacity: Maximum number of entries kept in the cache
+            k: Number of past accesses tracked per entry for eviction
+            ttl: Default time-to-live for entries in seconds
+            retained_period: How long the access history of a removed entry
+                is kept in seconds; defaults to 10 * ttl
+        """
+        self.capacity = capacity
+        self.k = k
+        self.ttl = ttl
+        self.retained_period = retained_period if retained_period is not None else 10 * ttl
+        self._entries: Dict[Hashable, Tuple[Any, float, Deque[int]]] = {}
+        self._seq = itertools.count()
+        # Min-heap of (expiry, seq, key); entries superseded by a later set are skipped
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        # Min-heap of (k-th last access, last access, key); stale items are skipped
+        self._evict_heap: List[Tuple[int, int, Hashable]] = []
+        # Access history of removed entries, in removal order
+        self._retained: "OrderedDict[Hashable, Tuple[Deque[int], float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _eviction_priority(self, history: Deque[int]) -> Tuple[int, int]:
+        """
+        Entries accessed fewer than k times have an infinite backward
+        k-distance and sort first, least recently used first.
+        """
+        return (history[0] if len(history) == self.k else -1, history[-1])
+
+    def _record_access(self, key: Hashable, history: Deque[int]) -> int:
+        seq = next(self._seq)
+        history.append(seq)
+        heapq.heappush(self._evict_heap, (*self._eviction_priority(history), key))
+        if len(self._evict_heap) > 2 * len(self._entries) + 64:
+            self._compact_evict_heap()
+        return seq
+
+    def _compact_evict_heap(self) -> None:
+        """Rebuild the eviction heap from live entries, dropping stale items"""
+        self._evict_heap = [
+            (*self._eviction_priority(history), key)
+            for key, (_, _, history) in self._entries.items()
+        ]
+        heapq.heapify(self._evict_heap)
+
+    def _remove(self, key: Hashable) -> Any:
+        """Remove an entry, keeping its access history for the retained period"""
+        value, _, history = self._entries.pop(key)
+        self._retained.pop(key, None)
+        self._retained[key] = (history, time.monotonic() + self.retained_period)
+        if len(self._retained) > self.capacity:
+            self._retained.popitem(last=False)
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a value from the cache and record the access
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expiry, history = entry
+        if expiry <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._record_access(key, history)
+        return value
+
+    def is_full(self) -> bool:
+        return len(self._entries) >= self.capacity
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value in the cache, evicting an entry if at capacity
+
+        Args:
+            key: The key to store
+            value: The value to store
+            ttl: Time-to-live for this entry, defaults to the cache TTL
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            history = entry[2]
+        else:
+            retained = self._retained.pop(key, None)
+            if retained is not None and retained[1] > time.monotonic():
+                history = retained[0]
+            else:
+                history = deque(maxlen=self.k)
+            if self.is_full():
+                self._evict()
+
+        expiry = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        self._entries[key] = (value, expiry, history)
+        seq = self._record_access(key, history)
+        heapq.heappush(self._expiry_heap, (expiry, seq, key))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove a key from the cache, keeping its access history
+
+        Args:
+            key: The key to remove
+            default: Value returned if the key is not cached
+
+        Returns:
+            The removed value, or default
+        """
+        if key not in self._entries:
+            return default
+        return self._remove(key)
+
+    def _evict(self) -> None:
+        """Evict the entry with the oldest k-th most recent access"""
+        while self._evict_heap:
+            kth_seq, last_seq, key = heapq.heappop(self._evict_heap)
+            entry = self._entries.get(key)
+            if entry is not None and self._eviction_priority(entry[2]) == (kth_seq, last_seq):
+                self._remove(key)
+                return
+
+    def expire(self, limit: Optional[int] = None) -> int:
+        """
+        Remove expired entries in expiry order
+
+        Args:
+            limit: Maximum number of heap entries to process, or None for all
+
+        Returns:
+            Number of heap entries processed
+        """
+        now = time.monotonic()
+        processed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            if limit is not None and processed >= limit:
+                break
+            expiry, _, key = heapq.heappop(self._expiry_heap)
+            processed += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expiry:
+                self._remove(key)
+
+        # Retained histories all share one period, so removal order is expiry order
+        while self._retained:
+            key, (_, retained_until) = next(iter(self._retained.items()))
+            if retained_until > now:
+                break
+            del self._retained[key]
+        return processed
+
+    def clear(self) -> None:
+        """Remove all entries from the cache"""
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._evict_heap.clear()
+        self._retained.clear()
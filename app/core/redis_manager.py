@@ -1,17 +1,22 @@
 import redis
+import redis.asyncio as aioredis
 import asyncio
 import logging
+import random
 from typing import Dict, List, Optional, Any, Tuple
 from .consistent_hash import ConsistentHash
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+class WriteOutcomeUnknownError(Exception):
+    """A write timed out after being sent, so Redis may or may not have applied it"""
+
 class RedisManager:
     def __init__(self):
         """Initialize Redis connection pools and consistent hashing"""
-        self.connection_pools: Dict[str, redis.ConnectionPool] = {}
-        self.redis_clients: Dict[str, redis.Redis] = {}
+        self.connection_pools: Dict[str, aioredis.ConnectionPool] = {}
+        self.redis_clients: Dict[str, aioredis.Redis] = {}
         self.node_health: Dict[str, bool] = {}
         
         self.redis_nodes = settings.get_redis_nodes_list()
@@ -19,21 +24,17 @@ class RedisManager:
         
         self._initialize_connections()
         
-        asyncio.create_task(self._health_check_loop())
+        self._health_check_task = asyncio.create_task(self._health_check_loop())
 
     def _initialize_connections(self) -> None:
         """Initialize Redis connections for all nodes"""
         for node in self.redis_nodes:
             try:
-                self.connection_pools[node] = redis.ConnectionPool.from_url(
+                self.connection_pools[node] = aioredis.ConnectionPool.from_url(
                     node,
-                    password=settings.REDIS_PASSWORD,
-                    db=settings.REDIS_DB,
-                    socket_timeout=settings.REDIS_TIMEOUT,
-                    retry_on_timeout=True,
-                    max_connections=10
+                    **settings.get_redis_connection_params()
                 )
-                self.redis_clients[node] = redis.Redis(
+                self.redis_clients[node] = aioredis.Redis(
                     connection_pool=self.connection_pools[node]
                 )
                 self.node_health[node] = True
@@ -42,23 +43,40 @@ class RedisManager:
                 logger.error(f"Failed to connect to Redis node {node}: {str(e)}")
                 self.node_health[node] = False
 
+    async def _safe_ping(self, node: str) -> bool:
+        """Ping a Redis node, returning False instead of raising on failure"""
+        try:
+            await self.redis_clients[node].ping()
+            return True
+        except Exception:
+            return False
+
     async def _health_check_loop(self) -> None:
         """Periodic health check for Redis nodes"""
         while True:
-            await asyncio.sleep(30) 
-            for node in self.redis_nodes:
-                try:
-                    redis_client = self.redis_clients[node]
-                    redis_client.ping()
-                    if not self.node_health[node]:
-                        logger.info(f"Redis node {node} is back online")
-                    self.node_health[node] = True
-                except Exception:
-                    if self.node_health[node]:
-                        logger.error(f"Redis node {node} is down")
-                    self.node_health[node] = False
-
-    def get_connection(self, key: str) -> Tuple[redis.Redis, str]:
+            await asyncio.sleep(30 + random.uniform(-5, 5))
+            results = await asyncio.gather(
+                *(self._safe_ping(node) for node in self.redis_nodes),
+                return_exceptions=True
+            )
+            for node, healthy in zip(self.redis_nodes, results):
+                healthy = healthy is True
+                if healthy and not self.node_health[node]:
+                    logger.info(f"Redis node {node} is back online")
+                elif not healthy and self.node_health[node]:
+                    logger.error(f"Redis node {node} is down")
+                self.node_health[node] = healthy
+
+    async def close(self) -> None:
+        """Stop the health check loop and close all Redis connections"""
+        self._health_check_task.cancel()
+        for node, connection_pool in self.connection_pools.items():
+            try:
+                await connection_pool.disconnect()
+            except Exception as e:
+                logger.error(f"Failed to close connection to Redis node {node}: {str(e)}")
+
+    def get_connection(self, key: str) -> Tuple[aioredis.Redis, str]:
         """
         Get Redis connection for the given key using consistent hashing
         Returns tuple of (redis_client, node_url)
@@ -81,13 +99,54 @@ class RedisManager:
         for attempt in range(settings.REDIS_RETRY_ATTEMPTS):
             try:
                 redis_client, _ = self.get_connection(key)
-                return redis_client.incr(key, amount)
+                return await redis_client.incr(key, amount)
             except redis.RedisError as e:
                 if attempt == settings.REDIS_RETRY_ATTEMPTS - 1:
                     logger.error(f"Failed to increment counter after {settings.REDIS_RETRY_ATTEMPTS} attempts: {str(e)}")
                     raise Exception(f"Failed to increment counter: {str(e)}")
                 await asyncio.sleep(0.1 * (attempt + 1))  
 
+    async def pipeline_increment(self, items: Dict[str, int]) -> Dict[str, int]:
+        """
+        Increment multiple counters using one pipeline per shard
+        Returns dict of keys (and amounts) that were definitely not written
+
+        A shard whose pipeline times out may have applied it, so its keys are
+        logged as possibly applied and not returned, to avoid double counting.
+        """
+        failed: Dict[str, int] = {}
+
+        node_batches: Dict[str, List[Tuple[str, int]]] = {}
+        for key, amount in items.items():
+            try:
+                _, node = self.get_connection(key)
+            except Exception as e:
+                logger.error(f"No Redis node available for {key}: {str(e)}")
+                failed[key] = amount
+                continue
+            if node not in node_batches:
+                node_batches[node] = []
+            node_batches[node].append((key, amount))
+
+        for node, batch in node_batches.items():
+            redis_client = self.redis_clients[node]
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for key, amount in batch:
+                        pipe.incrby(key, amount)
+                    await pipe.execute()
+            except redis.TimeoutError as e:
+                logger.error(
+                    f"Timed out incrementing counters on node {node}, "
+                    f"{len(batch)} counters may have been applied: {str(e)}"
+                )
+            except redis.RedisError as e:
+                logger.error(f"Failed to increment counters on node {node}: {str(e)}")
+                for key, amount in batch:
+                    failed[key] = amount
+
+        return failed
+
     async def get(self, key: str) -> Tuple[Optional[int], str]:
         """
         Get value for a key from Redis
@@ -96,7 +155,7 @@ class RedisManager:
         for attempt in range(settings.REDIS_RETRY_ATTEMPTS):
             try:
                 redis_client, node = self.get_connection(key)
-                value = redis_client.get(key)
+                value = await redis_client.get(key)
                 return (int(value) if value is not None else 0), node
             except redis.RedisError as e:
                 if attempt == settings.REDIS_RETRY_ATTEMPTS - 1:
@@ -104,6 +163,34 @@ class RedisManager:
                     raise Exception(f"Failed to get counter value: {str(e)}")
                 await asyncio.sleep(0.1 * (attempt + 1))
 
+    async def incr_and_get(self, key: str, delta: int) -> Tuple[int, str]:
+        """
+        Apply a pending increment and read the counter in one round-trip
+        Returns tuple of (value, node_url)
+
+        INCRBY is not idempotent, so a non-zero delta is sent exactly once;
+        only the plain read is retried.
+
+        Raises:
+            WriteOutcomeUnknownError: If the write timed out and may have been applied
+        """
+        if not delta:
+            return await self.get(key)
+
+        try:
+            redis_client, node = self.get_connection(key)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.incrby(key, delta)
+                pipe.get(key)
+                value = (await pipe.execute())[-1]
+            return (int(value) if value is not None else 0), node
+        except redis.TimeoutError as e:
+            logger.error(f"Timed out updating counter {key}, increment of {delta} may have been applied: {str(e)}")
+            raise WriteOutcomeUnknownError(f"Failed to update counter value: {str(e)}")
+        except redis.RedisError as e:
+            logger.error(f"Failed to update counter value: {str(e)}")
+            raise Exception(f"Failed to update counter value: {str(e)}")
+
     async def mget(self, keys: List[str]) -> Dict[str, Tuple[int, str]]:
         """
         Get multiple values from Redis
@@ -118,24 +205,31 @@ class RedisManager:
                 node_keys[node] = []
             node_keys[node].append(key)
         
-        for node, node_key_list in node_keys.items():
-            redis_client = self.redis_clients[node]
-            try:
-                values = redis_client.mget(node_key_list)
-                for key, value in zip(node_key_list, values):
-                    result[key] = (int(value) if value is not None else 0, node)
-            except redis.RedisError as e:
-                logger.error(f"Failed to get counter values from node {node}: {str(e)}")
-                for key in node_key_list:
-                    result[key] = (0, node)
+        shard_results = await asyncio.gather(
+            *(self._mget_one(node, node_key_list) for node, node_key_list in node_keys.items()),
+            return_exceptions=True
+        )
+
+        for (node, node_key_list), values in zip(node_keys.items(), shard_results):
+            if isinstance(values, BaseException):
+                if not isinstance(values, redis.RedisError):
+                    raise values
+                logger.error(f"Failed to get counter values from node {node}: {str(values)}")
+                values = [None] * len(node_key_list)
+            for key, value in zip(node_key_list, values):
+                result[key] = (int(value) if value is not None else 0, node)
         
         return result
 
+    async def _mget_one(self, node: str, keys: List[str]) -> List[Optional[bytes]]:
+        """Get multiple values from a single Redis node"""
+        return await self.redis_clients[node].mget(keys)
+
     async def reset(self, key: str) -> bool:
         """Reset a counter to zero"""
         try:
             redis_client, _ = self.get_connection(key)
-            return bool(redis_client.delete(key))
+            return bool(await redis_client.delete(key))
         except redis.RedisError as e:
             logger.error(f"Failed to reset counter: {str(e)}")
             raise Exception(f"Failed to reset counter: {str(e)}")
@@ -1,8 +1,8 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from contextlib import asynccontextmanager
 import logging
 import time
 from datetime import datetime
@@ -19,8 +19,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services on startup and release them on shutdown"""
+    logger.info("Starting visit counter service...")
+    app.state.redis_manager = RedisManager()
+    app.state.visit_counter = VisitCounterService(redis_manager=app.state.redis_manager)
+
+    yield
+
+    logger.info("Shutting down visit counter service...")
+    await app.state.visit_counter.close()
+    await app.state.redis_manager.close()
+
 # Initialize FastAPI app with metadata
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title=settings.PROJECT_NAME,
     description="A scalable visit counter service with Redis sharding and caching",
     version="1.0.0",
@@ -32,8 +47,6 @@ app = FastAPI(
 # Application state
 app.state.start_time = datetime.now()
 app.state.request_count = 0
-app.state.redis_manager = RedisManager()
-app.state.visit_counter = VisitCounterService()
 
 # Middleware setup
 app.add_middleware(
@@ -44,7 +57,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.add_middleware(
     TrustedHostMiddleware, 
     allowed_hosts=["*"]  # Configure as needed for production
@@ -52,17 +64,13 @@ app.add_middleware(
 
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
+    app.state.request_count += 1
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
-@app.middleware("http")
-async def count_requests(request: Request, call_next):
-    app.state.request_count += 1
-    return await call_next(request)
-
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global error handler caught: {str(exc)}", exc_info=exc)
@@ -87,7 +95,7 @@ async def health_check():
 @app.get("/status")
 async def service_status():
     """Detailed service status endpoint"""
-    redis_status = await app.state.redis_manager.get_status()
+    redis_status = app.state.redis_manager.get_status()
     counter_status = await app.state.visit_counter.get_status()
     
     return {
@@ -100,16 +108,6 @@ async def service_status():
         "debug_mode": settings.DEBUG
     }
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    logger.info("Starting visit counter service...")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown"""
-    logger.info("Shutting down visit counter service...")
-
 app.include_router(
     api_router,
     prefix=settings.API_PREFIX,
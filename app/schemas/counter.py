@@ -37,4 +37,6 @@ class CounterMetrics(BaseModel):
     visits: int = 0
     status: CounterStatusEnum = CounterStatusEnum.INACTIVE
     cache_size: int = 0
-    last_update: datetime | None = None
\ No newline at end of file
+    last_update: datetime | None = None
+    cache_hits: int = 0
+    cache_misses: int = 0
\ No newline at end of file
@@ -1,20 +1,40 @@
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import asyncio
 import logging
-from datetime import datetime
-from ..core.redis_manager import RedisManager
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from ..core.redis_manager import RedisManager, WriteOutcomeUnknownError
+from ..core.lru_k_cache import LRUKCache
+from ..core.count_min_sketch import CountMinSketch
 from ..core.config import settings
 from ..schemas.counter import CounterMetrics, CounterStatus, CounterStatusEnum
 
 logger = logging.getLogger(__name__)
 
 class VisitCounterService:
-    def __init__(self):
+    def __init__(self, redis_manager: RedisManager):
         """Initialize the visit counter service with Redis manager and in-memory cache"""
-        self.redis_manager = RedisManager()
-        self.cache: Dict[str, Dict[str, Any]] = {}  # In-memory cache
-        self.write_buffer: Dict[str, int] = {}  # Write buffer for batching
-        self.last_write_time = datetime.now()
+        self.redis_manager = redis_manager
+        self._background_tasks: List[asyncio.Task] = []
+        self._inflight: Dict[str, asyncio.Task] = {}  # In-progress cache loads
+        # Write generation and number of running loads, per key with a load running
+        self._load_generations: Dict[str, List[int]] = {}
+        self.cache = LRUKCache(
+            capacity=settings.CACHE_CAPACITY,
+            k=2,
+            ttl=settings.CACHE_TTL_SECONDS
+        )  # In-memory cache
+        self._read_frequency = CountMinSketch(width=1024, depth=4)  # Cache admission filter
+        # Write buffers for batching, sharded by Redis node
+        self.write_buffers: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._buffer_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Serialises Redis writes and reads of a shard's counters, so a read
+        # never races a flush and a reset never lands before an in-flight flush
+        self._write_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._flushing: Dict[str, Dict[str, int]] = {}  # Batch being written per shard
+        self._stopping = asyncio.Event()
+        self.last_write_time = time.monotonic()
         self.metrics = CounterMetrics(
             visits=0,
             status=CounterStatusEnum.ACTIVE,
@@ -27,15 +47,33 @@ class VisitCounterService:
         
     def _start_background_tasks(self):
         """Start all background tasks"""
-        asyncio.create_task(self._batch_write_loop())
-        asyncio.create_task(self._cache_cleanup_loop())
-        asyncio.create_task(self._metrics_update_loop())
+        self._background_tasks = [
+            asyncio.create_task(self._batch_write_loop()),
+            asyncio.create_task(self._cache_cleanup_loop()),
+            asyncio.create_task(self._metrics_update_loop()),
+        ]
+
+    async def close(self):
+        """Stop background tasks and flush pending writes to Redis"""
+        # Let the batch loop finish a flush in progress instead of cancelling it
+        self._stopping.set()
+        for task in self._background_tasks[1:]:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        try:
+            await self._flush_write_buffer()
+        except Exception as e:
+            logger.error(f"Failed to flush write buffer on shutdown: {str(e)}")
         
     async def _batch_write_loop(self):
         """Background task to periodically flush write buffer to Redis"""
-        while True:
+        while not self._stopping.is_set():
             try:
-                await asyncio.sleep(settings.BATCH_INTERVAL_SECONDS)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.BATCH_INTERVAL_SECONDS)
+                    break
+                except asyncio.TimeoutError:
+                    pass
                 await self._flush_write_buffer()
             except Exception as e:
                 logger.error(f"Error in batch write loop: {str(e)}")
@@ -45,7 +83,7 @@ class VisitCounterService:
         while True:
             try:
                 await asyncio.sleep(settings.CACHE_TTL_SECONDS)
-                self._cleanup_cache()
+                await self._cleanup_cache()
             except Exception as e:
                 logger.error(f"Error in cache cleanup loop: {str(e)}")
 
@@ -58,15 +96,10 @@ class VisitCounterService:
             except Exception as e:
                 logger.error(f"Error in metrics update loop: {str(e)}")
 
-    def _cleanup_cache(self):
-        """Remove expired entries from cache"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, entry in self.cache.items()
-            if (now - entry['timestamp']).total_seconds() >= settings.CACHE_TTL_SECONDS
-        ]
-        for key in expired_keys:
-            del self.cache[key]
+    async def _cleanup_cache(self):
+        """Remove expired entries from cache, yielding between large batches"""
+        while self.cache.expire(limit=1000) == 1000:
+            await asyncio.sleep(0)
 
     async def update_metrics(self):
         try:
@@ -75,31 +108,107 @@ class VisitCounterService:
                 visits=self.metrics.visits,
                 status=CounterStatusEnum.ACTIVE,
                 cache_size=len(self.cache),
-                last_update=datetime.now()
+                last_update=datetime.now(),
+                cache_hits=self.metrics.cache_hits,
+                cache_misses=self.metrics.cache_misses
             )
         except Exception as e:
             logging.error(f"Error in metrics update loop: {str(e)}")
 
+    def _get_buffer_node(self, cache_key: str) -> str:
+        """Get the Redis node whose write buffer holds the given key"""
+        return self.redis_manager.consistent_hash.get_node(cache_key)
+
+    def _get_buffered_count(self, page_id: str) -> int:
+        """Get the number of visits for a page not yet written to Redis"""
+        return (
+            sum(buffer.get(page_id, 0) for buffer in self.write_buffers.values())
+            + sum(batch.get(page_id, 0) for batch in self._flushing.values())
+        )
+
+    def get_write_buffer_size(self) -> int:
+        """Get the number of pages with pending writes across all shards"""
+        return sum(len(buffer) for buffer in self.write_buffers.values())
+
     async def _flush_write_buffer(self):
         """Flush write buffer to Redis"""
-        if not self.write_buffer:
+        nodes = [node for node, buffer in self.write_buffers.items() if buffer]
+        if not nodes:
             return
-            
-        buffer_to_write = self.write_buffer.copy()
-        self.write_buffer.clear()
-        
-        for page_id, count in buffer_to_write.items():
-            if count > 0:
-                try:
-                    await self.redis_manager.increment(f"visits:{page_id}", count)
-                except Exception as e:
-                    logger.error(f"Failed to flush counter for {page_id}: {str(e)}")
-                    # Restore count to buffer
-                    if page_id not in self.write_buffer:
-                        self.write_buffer[page_id] = 0
-                    self.write_buffer[page_id] += count
 
-        self.last_write_time = datetime.now()
+        await asyncio.gather(*(self._flush_shard(node) for node in nodes))
+
+        self.last_write_time = time.monotonic()
+
+    async def _flush_shard(self, node: str):
+        """Flush the write buffer of a single shard to Redis"""
+        async with self._write_locks[node]:
+            async with self._buffer_locks[node]:
+                buffer_to_write, self.write_buffers[node] = self.write_buffers[node], {}
+            if not buffer_to_write:
+                return
+
+            # Keep the batch visible to readers until the write has landed
+            self._flushing[node] = buffer_to_write
+            try:
+                failed = await self.redis_manager.pipeline_increment({
+                    f"visits:{page_id}": count
+                    for page_id, count in buffer_to_write.items() if count > 0
+                })
+            except Exception as e:
+                # The pipeline may have been sent; don't risk writing it twice
+                logger.error(
+                    f"Flush to {node} failed with unknown outcome, "
+                    f"{sum(buffer_to_write.values())} visits may not have been written: {str(e)}"
+                )
+                failed = {}
+            finally:
+                del self._flushing[node]
+
+            # Restore counts that were definitely not written to the buffer
+            self._restore_buffer(node, {
+                key[len("visits:"):]: count for key, count in failed.items()
+            })
+
+            # Cached or in-flight counts for the batch predate the write
+            for page_id in buffer_to_write:
+                self._invalidate(f"visits:{page_id}")
+
+    def _restore_buffer(self, node: str, counts: Dict[str, int]) -> None:
+        """Merge unwritten counts back into a shard's write buffer"""
+        buffer = self.write_buffers[node]
+        for page_id, count in counts.items():
+            buffer[page_id] = buffer.get(page_id, 0) + count
+
+    def _begin_load(self, cache_key: str) -> int:
+        """Register a running load for a key and return its write generation"""
+        state = self._load_generations.setdefault(cache_key, [0, 0])
+        state[1] += 1
+        return state[0]
+
+    def _end_load(self, cache_key: str, generation: int) -> bool:
+        """Unregister a load; returns True if no write happened while it ran"""
+        state = self._load_generations[cache_key]
+        state[1] -= 1
+        if state[1] == 0:
+            del self._load_generations[cache_key]
+        return state[0] == generation
+
+    def _bump_generation(self, cache_key: str) -> None:
+        """Mark running loads for a key as stale after a write"""
+        state = self._load_generations.get(cache_key)
+        if state is not None:
+            state[0] += 1
+
+    def _invalidate(self, cache_key: str) -> None:
+        """
+        Drop the cached count for a key after a write
+
+        A running load is kept so readers keep coalescing onto it; it will
+        not cache its now stale result, and readers add the buffered visits.
+        """
+        self._bump_generation(cache_key)
+        self.cache.pop(cache_key, None)
 
     async def increment_visit(self, page_id: str) -> None:
         """
@@ -109,18 +218,74 @@ class VisitCounterService:
             page_id: Unique identifier for the page
         """
         try:
-            if page_id not in self.write_buffer:
-                self.write_buffer[page_id] = 0
-            self.write_buffer[page_id] += 1
-            
             cache_key = f"visits:{page_id}"
-            if cache_key in self.cache:
-                del self.cache[cache_key]
+            node = self._get_buffer_node(cache_key)
+            async with self._buffer_locks[node]:
+                buffer = self.write_buffers[node]
+                buffer[page_id] = buffer.get(page_id, 0) + 1
+            
+            self._invalidate(cache_key)
                 
         except Exception as e:
             logger.error(f"Failed to increment visit for {page_id}: {str(e)}")
             raise
             
+    def _cache_count(self, cache_key: str, count: int) -> None:
+        """
+        Cache a count, with TTL and admission based on how often the page is read
+
+        Frequently read pages are cached with the hot TTL. Rarely read pages
+        get the cold TTL and are only admitted while the cache has free space,
+        so one-off reads cannot evict hot pages.
+        """
+        if self._read_frequency.estimate(cache_key) >= settings.CACHE_ADMISSION_THRESHOLD:
+            self.cache.set(cache_key, count, ttl=settings.HOT_CACHE_TTL_SECONDS)
+        elif not self.cache.is_full():
+            self.cache.set(cache_key, count, ttl=settings.COLD_CACHE_TTL_SECONDS)
+
+    async def _load_visit_count(self, page_id: str, cache_key: str) -> Tuple[int, str]:
+        """
+        Apply buffered visits for a page, read its count from Redis and cache it
+        
+        The count is only cached if no write happened during the load; visits
+        recorded meanwhile stay buffered and are added by the readers.
+        
+        Args:
+            page_id: Unique identifier for the page
+            cache_key: Redis and cache key for the page
+            
+        Returns:
+            Tuple of (visit_count, source)
+        """
+        buffer_node = self._get_buffer_node(cache_key)
+        async with self._write_locks[buffer_node]:
+            generation = self._begin_load(cache_key)
+            try:
+                async with self._buffer_locks[buffer_node]:
+                    delta = self.write_buffers[buffer_node].pop(page_id, 0)
+                
+                try:
+                    count, node = await self.redis_manager.incr_and_get(cache_key, delta)
+                except WriteOutcomeUnknownError:
+                    # The increment may have landed; restoring it could count it twice
+                    raise
+                except Exception:
+                    if delta:
+                        self._restore_buffer(buffer_node, {page_id: delta})
+                    raise
+            finally:
+                unchanged = self._end_load(cache_key, generation)
+        
+        if unchanged:
+            self._cache_count(cache_key, count)
+        
+        return count, f"redis_{node}"
+
+    def _clear_inflight(self, cache_key: str, task: asyncio.Task) -> None:
+        """Unregister a finished load unless a newer one has replaced it"""
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+
     async def get_visit_count(self, page_id: str) -> Tuple[int, str]:
         """
         Get current visit count for a page
@@ -129,36 +294,42 @@ class VisitCounterService:
             page_id: Unique identifier for the page
             
         Returns:
-            Tuple of (visit_count, source)
+            Tuple of (visit_count, served_via) where served_via is "in_memory",
+            "redis_<node>" or "write_buffer"
         """
         cache_key = f"visits:{page_id}"
         
         try:
-            if cache_key in self.cache:
-                cache_entry = self.cache[cache_key]
-                if (datetime.now() - cache_entry['timestamp']).total_seconds() < settings.CACHE_TTL_SECONDS:
-                    self.metrics.cache_hits += 1
-                    return cache_entry['value'], "in_memory"
+            self._read_frequency.add(cache_key)
+            
+            cached_count = self.cache.get(cache_key)
+            if cached_count is not None:
+                self.metrics.cache_hits += 1
+                return cached_count, "in_memory"
                 
             self.metrics.cache_misses += 1
             
-            await self._flush_write_buffer()
-            
-            count, node = await self.redis_manager.get(cache_key)
+            # Coalesce concurrent misses for the same page into one Redis read
+            inflight = self._inflight.get(cache_key)
+            if inflight is None:
+                inflight = asyncio.create_task(self._load_visit_count(page_id, cache_key))
+                self._inflight[cache_key] = inflight
+                inflight.add_done_callback(lambda task: self._clear_inflight(cache_key, task))
             
-            if page_id in self.write_buffer:
-                count += self.write_buffer[page_id]
-            
-            self.cache[cache_key] = {
-                'value': count,
-                'timestamp': datetime.now()
-            }
-            
-            return count, f"redis_{node}"
+            count, served_via = await asyncio.shield(inflight)
+            # Include visits recorded after the shared load applied the buffer
+            return count + self._get_buffered_count(page_id), served_via
             
         except Exception as e:
             logger.error(f"Failed to get visit count for {page_id}: {str(e)}")
-            return self.write_buffer.get(page_id, 0), "write_buffer"
+            return self._get_buffered_count(page_id), "write_buffer"
+
+    async def get_cache_stats(self) -> Dict[str, int]:
+        """Get in-memory cache hit/miss counters"""
+        return {
+            "hits": self.metrics.cache_hits,
+            "misses": self.metrics.cache_misses
+        }
 
     async def reset_counter(self, page_id: str) -> bool:
         """
@@ -172,10 +343,18 @@ class VisitCounterService:
         """
         cache_key = f"visits:{page_id}"
         try:
-            self.cache.pop(cache_key, None)
-            self.write_buffer.pop(page_id, None)
-            
-            return await self.redis_manager.reset(cache_key)
+            node = self._get_buffer_node(cache_key)
+            # Wait for any in-flight flush of this shard so it cannot land after the reset
+            async with self._write_locks[node]:
+                self._invalidate(cache_key)
+                async with self._buffer_locks[node]:
+                    self.write_buffers[node].pop(page_id, None)
+                
+                try:
+                    return await self.redis_manager.reset(cache_key)
+                finally:
+                    # Drop anything a load cached from before the reset landed
+                    self._invalidate(cache_key)
         except Exception as e:
             logger.error(f"Failed to reset counter for {page_id}: {str(e)}")
             raise
@@ -184,11 +363,14 @@ class VisitCounterService:
         """Get current service status"""
         try:
             redis_status = self.redis_manager.get_status()
+            last_batch_write = datetime.now() - timedelta(
+                seconds=time.monotonic() - self.last_write_time
+            )
             return CounterStatus(
                 status="healthy" if redis_status["healthy_nodes"] > 0 else "error",
-                metrics=self.metrics,
+                metrics=self.metrics.model_dump(),
                 redis_nodes=redis_status["node_status"],
-                last_batch_write=self.last_write_time
+                last_batch_write=last_batch_write
             )
         except Exception as e:
             logger.error(f"Failed to get service status: {str(e)}")